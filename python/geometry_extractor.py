@@ -4,13 +4,66 @@ Designed to run in browser via Pyodide with minimal dependencies
 """
 
 import json
-import re
 from typing import Dict, List, Any, Optional
 
 
+def _iter_lines(content: str, start: int = 0):
+    """Yield lines of content one at a time (from offset start) without building a list"""
+    n = len(content)
+    while start < n:
+        nl = content.find('\n', start)
+        if nl < 0:
+            yield content[start:]
+            return
+        yield content[start:nl]
+        start = nl + 1
+
+
+def _table_offset(content: str, header: str) -> int:
+    """Offset of the line following a table header whose first field is header, or -1"""
+    offset = 0
+    for line in _iter_lines(content):
+        offset += len(line) + 1
+        fields = line.split(None, 1)
+        if fields and fields[0].upper() == header:
+            return offset
+    return -1
+
+
+def _keyword(line: str) -> Optional[str]:
+    """Keyword field of an ElastoDyn input line (value keyword - description), or None"""
+    parts = line.split(None, 2)
+    if len(parts) < 2 or parts[1][0] not in _ED_FIRST_CHARS:
+        return None
+    # Per-blade keywords carry an index, e.g. PreCone(1), BldFile(2) or BldFile2
+    return parts[1].split('(', 1)[0].rstrip('0123456789')
+
+
+def _locate_kw(content: str, kw: str) -> Optional[str]:
+    """First line containing kw, ignoring section dividers and full comment lines"""
+    idx = content.find(kw)
+    while idx >= 0:
+        line_start = content.rfind('\n', 0, idx) + 1
+        line_end = content.find('\n', idx)
+        if line_end < 0:
+            line_end = len(content)
+        line = content[line_start:line_end]
+        if line[:3] != '---' and line.lstrip()[:1] != '!':
+            return line
+        idx = content.find(kw, line_end)
+    return None
+
+
+def _basename(path: str) -> str:
+    """Final component of a path written with either '/' or '\\' separators"""
+    return path.rsplit('/', 1)[-1].rsplit('\\', 1)[-1]
+
+
 class GeometryExtractor:
     """Extract geometric data from OpenFAST input files"""
     
+    __slots__ = ('geometry', 'files', '_basename_index', '_blade_cache', '_main_fst_name')
+    
     def __init__(self):
         self.geometry = {
             'config': {},
@@ -22,43 +75,51 @@ class GeometryExtractor:
             'filesRead': []
         }
         self.files = {}  # Store uploaded files: {filename: content}
+        self._basename_index: Dict[str, str] = {}  # {basename: filename}, first upload wins
+        self._blade_cache: Dict[str, Optional[list]] = {}  # {uploaded filename: parsed stations}
+        self._main_fst_name: Optional[str] = None  # Name of the first uploaded .fst file
     
     def add_file(self, filename: str, content: str):
         """Add a file to the virtual filesystem"""
         self.files[filename] = content
+        self._basename_index.setdefault(_basename(filename), filename)
+        if self._main_fst_name is None and filename.endswith('.fst'):
+            self._main_fst_name = filename
     
-    def get_file(self, filepath: str):
-        """Get file by exact path or normalized basename"""
-        import os
-        
+    def resolve_file(self, filepath: str) -> Optional[str]:
+        """Get the uploaded filename matching a path exactly or by normalized basename"""
         # Try exact match first
         if filepath in self.files:
-            return self.files[filepath]
+            return filepath
         
         # Try basename match
-        basename = os.path.basename(filepath)
+        basename = _basename(filepath)
         if basename in self.files:
-            return self.files[basename]
+            return basename
         
         # Try matching any uploaded file with same basename
-        for uploaded_name, content in self.files.items():
-            if os.path.basename(uploaded_name) == basename:
-                return content
-        
-        return None
+        return self._basename_index.get(basename)
+    
+    def get_file(self, filepath: str):
+        """Get file by exact path or normalized basename"""
+        uploaded_name = self.resolve_file(filepath)
+        return self.files[uploaded_name] if uploaded_name is not None else None
         
     def read_value(self, line: str, value_type=str):
         """Extract value from OpenFAST input line (value followed by comment)"""
         try:
-            # Split by common delimiters and take first part
-            parts = re.split(r'[!\-]', line.strip())
-            if not parts[0].strip():
-                return None
+            # Drop any inline comment, then take the first whitespace-delimited field.
+            # '-' is not a delimiter: values may be negative or contain dashes.
+            bang = line.find('!')
+            if bang >= 0:
+                line = line[:bang]
             
-            value = parts[0].strip().split()[0]
+            fields = line.split(None, 1)
+            if not fields:
+                return None
             
             # Remove quotes
-            value = value.strip('"').strip("'")
+            value = fields[0].strip('"\'')
             
             if value_type == float:
                 return float(value)
@@ -73,37 +134,30 @@ class GeometryExtractor:
     
     def parse_main_file(self, content: str) -> bool:
         """Parse the main .fst file"""
-        lines = content.split('\n')
         try:
-            # Find input file references
+            # Find input file references by searching the raw content; only two are needed
             found_ed = False
             found_aero = False
             
-            for i, line in enumerate(lines):
-                # Skip full comment lines
-                line_stripped = line.strip()
-                if not line_stripped or line_stripped.startswith('!') or line_stripped.startswith('---'):
-                    continue
+            ed_line = _locate_kw(content, 'EDFile') or _locate_kw(content, 'ElastoDyn input file')
+            if ed_line:
+                ed_file = self.read_value(ed_line, str)
+                ed_content = self.get_file(ed_file) if ed_file else None
                 
-                # Check if line contains file reference keywords
-                # Keywords can be anywhere in the line (value or comment)
-                if 'EDFile' in line or 'ElastoDyn input file' in line:
-                    ed_file = self.read_value(line, str)
-                    ed_content = self.get_file(ed_file) if ed_file else None
-                    
-                    if ed_content:
-                        found_ed = True
-                        self.parse_elastodyn_file(ed_content)
-                    elif ed_file:
-                        self.geometry['warnings'].append(f"EDFile '{ed_file}' not found")
-                        
-                elif 'AeroFile' in line or 'AeroDyn input file' in line:
-                    aero_file = self.read_value(line, str)
-                    aero_content = self.get_file(aero_file) if aero_file else None
-                    
-                    if aero_content:
-                        found_aero = True
-                        self.parse_aerodyn_file(aero_content)
+                if ed_content:
+                    found_ed = True
+                    self.parse_elastodyn_file(ed_content)
+                elif ed_file:
+                    self.geometry['warnings'].append(f"EDFile '{ed_file}' not found")
+            
+            aero_line = _locate_kw(content, 'AeroFile') or _locate_kw(content, 'AeroDyn input file')
+            if aero_line:
+                aero_file = self.read_value(aero_line, str)
+                aero_content = self.get_file(aero_file) if aero_file else None
+                
+                if aero_content:
+                    found_aero = True
+                    self.parse_aerodyn_file(aero_content)
             
             if not found_ed:
                 self.geometry['warnings'].append("No ElastoDyn file reference found or file not uploaded")
@@ -114,71 +168,91 @@ class GeometryExtractor:
             self.geometry['errors'].append(f"Error parsing main file: {str(e)}")
             return False
     
+    def _ed_num_blades(self, line: str):
+        """Read NumBl: number of blades"""
+        self.geometry['config']['numBlades'] = self.read_value(line, int)
+    
+    def _ed_tip_rad(self, line: str):
+        """Read TipRad: rotor diameter and blade length"""
+        tip_rad = self.read_value(line, float)
+        if tip_rad:
+            self.geometry['config']['rotorDiameter'] = tip_rad * 2
+            self.geometry['blades']['length'] = tip_rad
+    
+    def _ed_hub_rad(self, line: str):
+        """Read HubRad: hub radius"""
+        self.geometry['hub']['radius'] = self.read_value(line, float)
+    
+    def _ed_precone(self, line: str):
+        """Read PreCone(n): blade cone angle"""
+        self.geometry['blades']['precone'] = self.read_value(line, float)
+    
+    def _ed_overhang(self, line: str):
+        """Read OverHang: distance from yaw axis to rotor apex"""
+        self.geometry['hub']['overhang'] = self.read_value(line, float)
+    
+    def _ed_shft_tilt(self, line: str):
+        """Read ShftTilt: rotor shaft tilt angle"""
+        self.geometry['hub']['shaftTilt'] = self.read_value(line, float)
+    
+    def _ed_tower_ht(self, line: str):
+        """Read TowerHt: tower height, returned for the hub height calculation"""
+        tower_ht = self.read_value(line, float)
+        if tower_ht:
+            self.geometry['tower']['height'] = tower_ht
+        return tower_ht
+    
+    def _ed_tower_bs_ht(self, line: str):
+        """Read TowerBsHt: tower base elevation"""
+        tower_bs_ht = self.read_value(line, float)
+        if tower_bs_ht is not None:
+            self.geometry['tower']['baseElevation'] = tower_bs_ht
+    
+    def _ed_twr2shft(self, line: str):
+        """Read Twr2Shft: tower-top to shaft distance, returned for the hub height calculation"""
+        return self.read_value(line, float)
+    
+    def _ed_bld_file(self, line: str):
+        """Read BldFile(n) and parse the referenced blade file"""
+        blade_file = self.read_value(line, str)
+        uploaded_name = self.resolve_file(blade_file) if blade_file else None
+        if uploaded_name is not None and self.files[uploaded_name]:
+            # Blades usually share one file, so each upload is parsed once and its stations
+            # reused; 'Blade properties' and the station count are reported once per file
+            if uploaded_name not in self._blade_cache:
+                self._blade_cache[uploaded_name] = self.parse_blade_file(self.files[uploaded_name])
+            elif self._blade_cache[uploaded_name]:
+                self.geometry['blades']['stations'] = self._blade_cache[uploaded_name]
+    
+    def _ed_twr_file(self, line: str):
+        """Read TwrFile and parse the referenced tower file"""
+        tower_file = self.read_value(line, str)
+        tower_content = self.get_file(tower_file) if tower_file else None
+        if tower_content:
+            self.parse_tower_file(tower_content)
+    
     def parse_elastodyn_file(self, content: str) -> bool:
         """Parse ElastoDyn input file for structural geometry"""
-        lines = content.split('\n')
         try:
-            # Track values we need to combine
-            tower_ht = None
-            twr2shft = None
-            tower_bs_ht = None
+            # Track values we need to combine (only the TowerHt and Twr2Shft handlers return one)
+            values = {}
+            remaining = set(_ED_HANDLERS)
             
-            i = 0
-            while i < len(lines):
-                line = lines[i].strip()
-                
-                # Number of blades
-                if 'NumBl' in line:
-                    self.geometry['config']['numBlades'] = self.read_value(line, int)
-                
-                # Rotor geometry
-                elif 'TipRad' in line:
-                    tip_rad = self.read_value(line, float)
-                    if tip_rad:
-                        self.geometry['config']['rotorDiameter'] = tip_rad * 2
-                        self.geometry['blades']['length'] = tip_rad
-                        
-                elif 'HubRad' in line:
-                    self.geometry['hub']['radius'] = self.read_value(line, float)
-                    
-                elif 'PreCone' in line:
-                    self.geometry['blades']['precone'] = self.read_value(line, float)
-                    
-                elif 'OverHang' in line:
-                    self.geometry['hub']['overhang'] = self.read_value(line, float)
-                    
-                elif 'ShftTilt' in line:
-                    self.geometry['hub']['shaftTilt'] = self.read_value(line, float)
-                
-                # Tower geometry
-                elif 'TowerHt' in line and 'TowerBsHt' not in line:
-                    tower_ht = self.read_value(line, float)
-                    if tower_ht:
-                        self.geometry['tower']['height'] = tower_ht
-                
-                elif 'TowerBsHt' in line:
-                    tower_bs_ht = self.read_value(line, float)
-                    if tower_bs_ht is not None:
-                        self.geometry['tower']['baseElevation'] = tower_bs_ht
-                
-                elif 'Twr2Shft' in line:
-                    twr2shft = self.read_value(line, float)
-                
-                # Blade file reference
-                elif 'BldFile' in line:
-                    blade_file = self.read_value(line, str)
-                    blade_content = self.get_file(blade_file) if blade_file else None
-                    if blade_content:
-                        self.parse_blade_file(blade_content)
-                
-                # Tower file reference
-                elif 'TwrFile' in line:
-                    tower_file = self.read_value(line, str)
-                    tower_content = self.get_file(tower_file) if tower_file else None
-                    if tower_content:
-                        self.parse_tower_file(tower_content)
-                
-                i += 1
+            for line in _iter_lines(content):
+                keyword = _keyword(line)
+                handler = _ED_HANDLERS.get(keyword)
+                if handler is not None:
+                    value = handler(self, line)
+                    if value is not None:
+                        values[keyword] = value
+                    remaining.discard(keyword)
+                elif not remaining:
+                    # All keywords captured; per-blade entries (PreCone(n), BldFile(n))
+                    # are listed consecutively, so the first other line ends the scan
+                    break
+            
+            tower_ht = values.get('TowerHt')
+            twr2shft = values.get('Twr2Shft')
             
             # Calculate hub height: TowerHt + Twr2Shft
             if tower_ht is not None:
@@ -194,28 +268,34 @@ class GeometryExtractor:
             self.geometry['errors'].append(f"Error parsing ElastoDyn file: {str(e)}")
             return False
     
-    def parse_blade_file(self, content: str) -> bool:
-        """Parse blade distributed properties file for stick figure geometry"""
-        lines = content.split('\n')
+    def parse_blade_file(self, content: str) -> Optional[list]:
+        """Parse blade distributed properties file for stick figure geometry
+        
+        Returns the parsed stations, or None if none were found.
+        """
         try:
             # Find the distributed properties table
             # Format: BlFract  PitchAxis  StrcTwst  BMassDen  FlpStff  EdgStff
             stations = []
-            in_table = False
             
-            for i, line in enumerate(lines):
-                # Look for column headers
-                line_upper = line.upper()
-                if 'BLFRACT' in line_upper:
-                    in_table = True
-                    continue
+            # Phase 1: locate the column headers
+            offset = _table_offset(content, 'BLFRACT')
+            if offset < 0:
+                return None
+            
+            # Phase 2: read rows until the next section header (mode shapes follow)
+            for line in _iter_lines(content, offset):
+                if line[:3] == '---':
+                    break
                     
-                if in_table and line.strip() and not line.strip().startswith('!') and not line.strip().startswith('---'):
+                s = line.strip()
+                if s and s[0] != '!':
                     # Remove inline comments
-                    if '!' in line:
-                        line = line.split('!')[0]
+                    if '!' in s:
+                        s = s.split('!')[0]
                     
-                    parts = line.split()
+                    # Only the first three columns are needed
+                    parts = s.split(None, 3)
                     if len(parts) >= 3:
                         try:
                             # ElastoDyn blade format:
@@ -233,58 +313,54 @@ class GeometryExtractor:
                 self.geometry['blades']['stations'] = stations
                 self.geometry['filesRead'].append('Blade properties')
                 self.geometry['warnings'].append(f"Parsed {len(stations)} blade stations")
+                return stations
             
-            return True
+            return None
         except Exception as e:
             self.geometry['warnings'].append(f"Could not parse blade properties: {str(e)}")
-            return False
+            return None
     
     def parse_tower_file(self, content: str) -> bool:
         """Parse tower distributed properties file for stick figure geometry"""
-        lines = content.split('\n')
         try:
             # Find the distributed properties table
             # Format: HtFract  TMassDen  TwFAStif  TwSSStif
             stations = []
-            in_table = False
             
-            for i, line in enumerate(lines):
-                line_upper = line.upper()
-                
-                # Check for end of table (next section header)
-                if in_table and line.strip().startswith('---'):
+            # Phase 1: locate the column headers
+            offset = _table_offset(content, 'HTFRACT')
+            if offset < 0:
+                return True
+            
+            # Phase 2: read rows until the next section header or non-numeric data
+            for line in _iter_lines(content, offset):
+                if line[:3] == '---':
                     break
                 
-                if 'HTFRACT' in line_upper:
-                    in_table = True
+                s = line.strip()
+                
+                # Skip blank lines, comments and the units row, e.g. (-)  (kg/m)
+                if not s or s[0] == '!' or s[0] == '(':
                     continue
-                    
-                if in_table and line.strip() and not line.strip().startswith('!') and not line.strip().startswith('---'):
-                    # Remove inline comments
-                    if '!' in line:
-                        line = line.split('!')[0]
-                    
-                    parts = line.split()
-                    if len(parts) >= 1:
-                        try:
-                            # ElastoDyn tower format:
-                            # HtFract (0-1), TMassDen, TwFAStif, TwSSStif
-                            # For stick figure, we only need the height fraction
-                            height_frac = float(parts[0])
-                            
-                            # Sanity check: HtFract should be between 0 and 1
-                            if 0 <= height_frac <= 1:
-                                station = {
-                                    'heightFraction': height_frac,
-                                }
-                                stations.append(station)
-                            else:
-                                # Hit invalid data, likely end of table
-                                break
-                        except ValueError:
-                            # Hit non-numeric data, likely end of table
-                            if in_table:
-                                break
+                
+                # Remove inline comments
+                if '!' in s:
+                    s = s.split('!')[0]
+                
+                try:
+                    # ElastoDyn tower format:
+                    # HtFract (0-1), TMassDen, TwFAStif, TwSSStif
+                    # For stick figure, we only need the height fraction
+                    height_frac = float(s.split(None, 1)[0])
+                except ValueError:
+                    # Hit non-numeric data, likely end of table
+                    break
+                
+                # Sanity check: HtFract should be between 0 and 1
+                if not 0 <= height_frac <= 1:
+                    # Hit invalid data, likely end of table
+                    break
+                stations.append({'heightFraction': height_frac})
             
             if stations:
                 self.geometry['tower']['stations'] = stations
@@ -304,23 +380,40 @@ class GeometryExtractor:
     
     def extract_geometry(self) -> str:
         """Extract geometry from all loaded files and return as JSON"""
-        # Find and parse main file
-        main_file = None
-        for filename, content in self.files.items():
-            if filename.endswith('.fst'):
-                main_file = content
-                break
+        # Main file is identified on upload; read its current content (it may be re-uploaded)
+        main_file = self.files[self._main_fst_name] if self._main_fst_name is not None else None
         
         if not main_file:
             self.geometry['errors'].append("No .fst file found")
-            return json.dumps({'success': False, 'geometry': self.geometry})
+            return json.dumps({'success': False, 'geometry': self.geometry},
+                              separators=(',', ':'), ensure_ascii=False)
         
         success = self.parse_main_file(main_file)
         
+        # Compact separators: the result string is copied across the Python/JS boundary
         return json.dumps({
             'success': success and len(self.geometry['errors']) == 0,
             'geometry': self.geometry
-        })
+        }, separators=(',', ':'), ensure_ascii=False)
+
+
+# ElastoDyn keyword -> handler, matched on the exact keyword field
+_ED_HANDLERS = {
+    'NumBl': GeometryExtractor._ed_num_blades,
+    'TipRad': GeometryExtractor._ed_tip_rad,
+    'HubRad': GeometryExtractor._ed_hub_rad,
+    'PreCone': GeometryExtractor._ed_precone,
+    'OverHang': GeometryExtractor._ed_overhang,
+    'ShftTilt': GeometryExtractor._ed_shft_tilt,
+    'TowerHt': GeometryExtractor._ed_tower_ht,
+    'TowerBsHt': GeometryExtractor._ed_tower_bs_ht,
+    'Twr2Shft': GeometryExtractor._ed_twr2shft,
+    'BldFile': GeometryExtractor._ed_bld_file,
+    'TwrFile': GeometryExtractor._ed_twr_file,
+}
+
+# Cheap prefilter: most ElastoDyn lines can be rejected on the keyword's first character
+_ED_FIRST_CHARS = frozenset(keyword[0] for keyword in _ED_HANDLERS)
 
 
 # Function to be called from JavaScript